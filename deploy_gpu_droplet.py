@@ -7,16 +7,35 @@ This script deploys a GPU-enabled droplet from a snapshot using the DigitalOcean
 
 import os
 import sys
-import json
+import contextlib
+import math
 import time
+import random
+import orjson
 import requests
-from typing import Optional, Dict, Any
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Optional, Dict, Any, Callable, Iterator
+
+
+_ALLOWED_METHODS = frozenset({"GET", "POST", "PUT", "DELETE"})
+# Statuses worth retrying: rate limiting and transient server/gateway errors
+_TRANSIENT_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class APIError(Exception):
+    """Raised when the DigitalOcean API returns an error response."""
+    
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
 
 
 class DigitalOceanAPI:
     """Wrapper class for DigitalOcean API v2 operations."""
     
     BASE_URL = "https://api.digitalocean.com/v2"
+    PER_PAGE = 200  # API maximum
     
     def __init__(self, api_token: str):
         """
@@ -30,6 +49,39 @@ class DigitalOceanAPI:
             "Authorization": f"Bearer {api_token}",
             "Content-Type": "application/json"
         }
+        # (connect, read) timeouts in seconds
+        self._timeout = (5, 30)
+        # Droplet ID -> ID of the create action returned by create_droplet
+        self._create_actions: Dict[int, int] = {}
+        
+        # Reuse keep-alive connections across calls instead of paying a new
+        # TCP+TLS handshake per request
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        # urllib3 retries transient statuses inside the connection pool,
+        # honouring Retry-After. POST is excluded so a droplet create that
+        # timed out at the gateway is never submitted twice. With
+        # raise_on_status off, the final response reaches raise_for_status
+        # and its API error message is preserved.
+        retry = Retry(
+            total=5,
+            backoff_factor=0.5,
+            status_forcelist=_TRANSIENT_STATUSES,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+            allowed_methods=frozenset({"GET", "DELETE", "PUT"})
+        )
+        self.session.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=10, max_retries=retry))
+    
+    def close(self) -> None:
+        """Close the underlying HTTP session and its pooled connections."""
+        self.session.close()
+    
+    def __enter__(self) -> "DigitalOceanAPI":
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
     
     def _make_request(self, method: str, endpoint: str, data: Optional[Dict] = None) -> Dict[str, Any]:
         """
@@ -44,45 +96,68 @@ class DigitalOceanAPI:
             JSON response as dictionary
             
         Raises:
-            requests.exceptions.RequestException: If API request fails
+            APIError: If the API returns an error response
+            requests.exceptions.RequestException: If the request cannot be completed
         """
+        method = method.upper()
+        if method not in _ALLOWED_METHODS:
+            raise ValueError(f"Unsupported HTTP method: {method}")
         url = f"{self.BASE_URL}{endpoint}"
         
         try:
-            if method.upper() == "GET":
-                response = requests.get(url, headers=self.headers)
-            elif method.upper() == "POST":
-                response = requests.post(url, headers=self.headers, json=data)
-            elif method.upper() == "DELETE":
-                response = requests.delete(url, headers=self.headers)
-            else:
-                raise ValueError(f"Unsupported HTTP method: {method}")
-            
+            response = self.session.request(method, url, json=data, timeout=self._timeout)
             response.raise_for_status()
-            return response.json()
+            # Parse the raw bytes directly; empty bodies (e.g. 204 on DELETE) yield {}
+            return orjson.loads(response.content) if response.content else {}
         except requests.exceptions.HTTPError as e:
-            error_msg = f"API Error: {e}"
-            if hasattr(e.response, 'text'):
-                try:
-                    error_data = e.response.json()
-                    if 'message' in error_data:
-                        error_msg = f"API Error: {error_data['message']}"
-                except:
-                    error_msg = f"API Error: {e.response.text}"
-            raise Exception(error_msg) from e
+            # Reuse the body that was already read; only a malformed JSON body is ignored
+            body = e.response.content
+            message = None
+            with contextlib.suppress(orjson.JSONDecodeError):
+                error_data = orjson.loads(body)
+                if isinstance(error_data, dict):
+                    message = error_data.get("message")
+            raise APIError(
+                f"API Error: {message or body.decode(errors='replace') or e}",
+                status=e.response.status_code
+            ) from e
+    
+    def _paginate(self, endpoint: str, key: str, per_page: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Yield items from a paginated list endpoint, one page at a time.
+        
+        Follows links.pages.next, so only the current page is held in memory
+        and callers can filter items as they arrive.
+        
+        Args:
+            endpoint: API endpoint (without base URL)
+            key: Response key holding the list of items
+            per_page: Page size (defaults to PER_PAGE, the API maximum)
+            
+        Yields:
+            Items from each page in order
+        """
+        separator = "&" if "?" in endpoint else "?"
+        next_endpoint = f"{endpoint}{separator}per_page={per_page or self.PER_PAGE}"
+        while next_endpoint:
+            response = self._make_request("GET", next_endpoint)
+            yield from response.get(key, [])
+            next_url = response.get("links", {}).get("pages", {}).get("next")
+            next_endpoint = next_url.replace(self.BASE_URL, "", 1) if next_url else None
     
     def get_regions(self) -> list:
         """Get list of available regions."""
-        response = self._make_request("GET", "/regions")
-        return response.get("regions", [])
+        return list(self._paginate("/regions", "regions"))
     
     def get_gpu_sizes(self) -> list:
         """Get list of available GPU droplet sizes."""
-        response = self._make_request("GET", "/sizes")
-        sizes = response.get("sizes", [])
-        # Filter for GPU-enabled sizes
-        gpu_sizes = [size for size in sizes if size.get("description", "").lower().find("gpu") != -1]
-        return gpu_sizes
+        # gpu_info is the structured marker; the description check only runs
+        # for sizes that lack it. Filtering while paging means non-GPU sizes
+        # are never accumulated.
+        return [
+            size for size in self._paginate("/sizes", "sizes")
+            if size.get("gpu_info") or "gpu" in size.get("description", "").lower()
+        ]
     
     def get_snapshot(self, snapshot_id: str) -> Dict[str, Any]:
         """
@@ -148,7 +223,15 @@ class DigitalOceanAPI:
             droplet_data["user_data"] = user_data
         
         response = self._make_request("POST", "/droplets", data=droplet_data)
-        return response.get("droplet", {})
+        droplet = response.get("droplet", {})
+        
+        # Remember the create action so wait_for_droplet can poll it instead
+        # of re-fetching the whole droplet
+        actions = response.get("links", {}).get("actions", [])
+        if droplet.get("id") is not None and actions:
+            self._create_actions[droplet["id"]] = actions[0]["id"]
+        
+        return droplet
     
     def get_droplet(self, droplet_id: int) -> Dict[str, Any]:
         """
@@ -163,13 +246,140 @@ class DigitalOceanAPI:
         response = self._make_request("GET", f"/droplets/{droplet_id}")
         return response.get("droplet", {})
     
-    def wait_for_droplet(self, droplet_id: int, timeout: int = 300) -> Dict[str, Any]:
+    def get_action(self, action_id: int) -> Dict[str, Any]:
+        """
+        Get action information.
+        
+        Args:
+            action_id: Action ID
+            
+        Returns:
+            Action information dictionary
+        """
+        response = self._make_request("GET", f"/actions/{action_id}")
+        return response.get("action", {})
+    
+    def _poll(
+        self,
+        check: Callable[[], Optional[Dict[str, Any]]],
+        timeout: float,
+        initial_delay: float,
+        max_delay: float
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Call check until it returns a result, with capped exponential backoff.
+        
+        The first check happens immediately, then the delay starts at
+        initial_delay and doubles up to max_delay between checks. Network
+        errors and transient API statuses (429/5xx) count as "not done yet"
+        and add up to 25% jitter to the next delay.
+        
+        Args:
+            check: Callable returning the result when done, None otherwise
+            timeout: Maximum wait time in seconds
+            initial_delay: Delay in seconds before the second check
+            max_delay: Upper bound in seconds for the delay between checks
+            
+        Returns:
+            The first result returned by check, or None on timeout
+            
+        Raises:
+            ValueError: If initial_delay is not positive or exceeds max_delay
+        """
+        if not 0 < initial_delay <= max_delay:
+            raise ValueError(
+                f"Polling delays must satisfy 0 < initial_delay <= max_delay "
+                f"(got initial_delay={initial_delay}, max_delay={max_delay})"
+            )
+        
+        start_time = time.time()
+        delay = initial_delay
+        
+        while True:
+            transient = False
+            try:
+                result = check()
+            except requests.exceptions.RequestException:
+                # Network failure that outlasted the session's own retries
+                result = None
+                transient = True
+            except APIError as e:
+                # Rate limiting or a gateway/server hiccup; the resource is
+                # still being provisioned, so keep waiting
+                if e.status not in _TRANSIENT_STATUSES:
+                    raise
+                result = None
+                transient = True
+            
+            if result is not None:
+                return result
+            
+            remaining = timeout - (time.time() - start_time)
+            if remaining <= 0:
+                return None
+            sleep_for = min(delay, max_delay)
+            if transient:
+                # Jitter after capping so retries stay spread out at max_delay too
+                sleep_for *= 1 + random.random() * 0.25
+            time.sleep(min(sleep_for, remaining))
+            delay = min(delay * 2, max_delay)
+    
+    def wait_for_action(
+        self,
+        action_id: int,
+        timeout: int = 300,
+        initial_delay: float = 1.0,
+        max_delay: float = 15.0
+    ) -> Dict[str, Any]:
+        """
+        Wait for an action to complete.
+        
+        Args:
+            action_id: Action ID
+            timeout: Maximum wait time in seconds
+            initial_delay: Delay in seconds before the second poll
+            max_delay: Upper bound in seconds for the delay between polls
+            
+        Returns:
+            Completed action information dictionary
+            
+        Raises:
+            TimeoutError: If action doesn't complete within timeout
+        """
+        def check() -> Optional[Dict[str, Any]]:
+            action = self.get_action(action_id)
+            status = action.get("status", "")
+            if status == "completed":
+                return action
+            elif status == "errored":
+                raise Exception(f"Action {action_id} errored")
+            return None
+        
+        action = self._poll(check, timeout, initial_delay, max_delay)
+        if action is None:
+            raise TimeoutError(f"Action {action_id} did not complete within {timeout} seconds")
+        return action
+    
+    def wait_for_droplet(
+        self,
+        droplet_id: int,
+        timeout: int = 300,
+        initial_delay: float = 1.0,
+        max_delay: float = 15.0
+    ) -> Dict[str, Any]:
         """
         Wait for droplet to become active.
         
+        For droplets created by this client, the small create action is
+        polled and the full droplet is fetched once it completes. Otherwise
+        the droplet itself is polled. Either way polling uses capped
+        exponential backoff (see _poll).
+        
         Args:
             droplet_id: Droplet ID
             timeout: Maximum wait time in seconds
+            initial_delay: Delay in seconds before the second poll
+            max_delay: Upper bound in seconds for the delay between polls
             
         Returns:
             Active droplet information dictionary
@@ -177,27 +387,34 @@ class DigitalOceanAPI:
         Raises:
             TimeoutError: If droplet doesn't become active within timeout
         """
-        start_time = time.time()
+        action_id = self._create_actions.pop(droplet_id, None)
+        if action_id is not None:
+            self.wait_for_action(action_id, timeout, initial_delay, max_delay)
+            return self.get_droplet(droplet_id)
         
-        while time.time() - start_time < timeout:
+        def check() -> Optional[Dict[str, Any]]:
             droplet = self.get_droplet(droplet_id)
             status = droplet.get("status", "")
-            
             if status == "active":
                 return droplet
             elif status == "error":
                 raise Exception(f"Droplet {droplet_id} entered error state")
-            
-            time.sleep(5)
+            return None
         
-        raise TimeoutError(f"Droplet {droplet_id} did not become active within {timeout} seconds")
+        droplet = self._poll(check, timeout, initial_delay, max_delay)
+        if droplet is None:
+            raise TimeoutError(f"Droplet {droplet_id} did not become active within {timeout} seconds")
+        return droplet
 
 
 def main():
     """Main function to deploy GPU droplet from snapshot."""
     
+    # Read all settings through one reference to the (live) process environment
+    env = os.environ
+    
     # Get API token from environment variable
-    api_token = os.getenv("DIGITALOCEAN_API_TOKEN")
+    api_token = env.get("DIGITALOCEAN_API_TOKEN")
     if not api_token:
         print("Error: DIGITALOCEAN_API_TOKEN environment variable not set")
         print("Please set it using: export DIGITALOCEAN_API_TOKEN='your-token'")
@@ -205,16 +422,19 @@ def main():
     
     # Configuration - modify these values as needed
     config = {
-        "droplet_name": os.getenv("DROPLET_NAME", "gpu-droplet"),
-        "region": os.getenv("DROPLET_REGION", "nyc1"),  # Change to your preferred region
-        "size": os.getenv("DROPLET_SIZE", "g-2vcpu-16gb"),  # GPU size slug
-        "snapshot_id": os.getenv("SNAPSHOT_ID"),  # Required: Your snapshot ID
-        "ssh_keys": os.getenv("SSH_KEYS", "").split(",") if os.getenv("SSH_KEYS") else None,
-        "tags": os.getenv("DROPLET_TAGS", "").split(",") if os.getenv("DROPLET_TAGS") else None,
-        "monitoring": os.getenv("MONITORING", "false").lower() == "true",
-        "ipv6": os.getenv("IPV6", "false").lower() == "true",
-        "private_networking": os.getenv("PRIVATE_NETWORKING", "true").lower() == "true",
-        "wait_for_active": os.getenv("WAIT_FOR_ACTIVE", "true").lower() == "true"
+        "droplet_name": env.get("DROPLET_NAME", "gpu-droplet"),
+        "region": env.get("DROPLET_REGION", "nyc1"),  # Change to your preferred region
+        "size": env.get("DROPLET_SIZE", "g-2vcpu-16gb"),  # GPU size slug
+        "snapshot_id": env.get("SNAPSHOT_ID"),  # Required: Your snapshot ID
+        # Comma-separated lists; empty entries (e.g. "a,,b" or a trailing comma) are dropped
+        "ssh_keys": [key.strip() for key in env.get("SSH_KEYS", "").split(",") if key.strip()] or None,
+        "tags": [tag.strip() for tag in env.get("DROPLET_TAGS", "").split(",") if tag.strip()] or None,
+        "monitoring": env.get("MONITORING", "false").lower() == "true",
+        "ipv6": env.get("IPV6", "false").lower() == "true",
+        "private_networking": env.get("PRIVATE_NETWORKING", "true").lower() == "true",
+        "wait_for_active": env.get("WAIT_FOR_ACTIVE", "true").lower() == "true",
+        "poll_initial_delay": env.get("POLL_INITIAL_DELAY", "1.0"),
+        "poll_max_delay": env.get("POLL_MAX_DELAY", "15.0")
     }
     
     # Validate required configuration
@@ -223,75 +443,93 @@ def main():
         print("Please set it using: export SNAPSHOT_ID='snapshot-id-or-slug'")
         sys.exit(1)
     
+    # Polling delays must be positive numbers with max >= initial, otherwise
+    # wait_for_droplet would spin without sleeping or crash in time.sleep
+    for key in ("poll_initial_delay", "poll_max_delay"):
+        try:
+            config[key] = float(config[key])
+            valid = math.isfinite(config[key]) and config[key] > 0
+        except ValueError:
+            valid = False
+        if not valid:
+            print(f"Error: {key.upper()} must be a positive number of seconds")
+            sys.exit(1)
+    if config["poll_max_delay"] < config["poll_initial_delay"]:
+        print("Error: POLL_MAX_DELAY must be greater than or equal to POLL_INITIAL_DELAY")
+        sys.exit(1)
+    
     # Initialize API client
     print("Initializing DigitalOcean API client...")
-    api = DigitalOceanAPI(api_token)
-    
-    try:
-        # Verify snapshot exists
-        print(f"Verifying snapshot: {config['snapshot_id']}")
-        snapshot = api.get_snapshot(config["snapshot_id"])
-        print(f"Snapshot found: {snapshot.get('name', 'N/A')} ({snapshot.get('id', 'N/A')})")
-        
-        # List available GPU sizes (optional, for reference)
-        print("\nFetching available GPU sizes...")
-        gpu_sizes = api.get_gpu_sizes()
-        if gpu_sizes:
-            print("Available GPU sizes:")
-            for size in gpu_sizes[:5]:  # Show first 5
-                print(f"  - {size.get('slug')}: {size.get('description')}")
-        else:
-            print("Warning: No GPU sizes found. Make sure you're using a GPU-enabled size slug.")
-        
-        # Create droplet
-        print(f"\nCreating droplet '{config['droplet_name']}'...")
-        print(f"  Region: {config['region']}")
-        print(f"  Size: {config['size']}")
-        print(f"  Snapshot: {config['snapshot_id']}")
-        
-        droplet = api.create_droplet(
-            name=config["droplet_name"],
-            region=config["region"],
-            size=config["size"],
-            snapshot_id=config["snapshot_id"],
-            ssh_keys=config["ssh_keys"],
-            tags=config["tags"],
-            monitoring=config["monitoring"],
-            ipv6=config["ipv6"],
-            private_networking=config["private_networking"]
-        )
-        
-        droplet_id = droplet.get("id")
-        print(f"\n✓ Droplet created successfully!")
-        print(f"  Droplet ID: {droplet_id}")
-        print(f"  Name: {droplet.get('name')}")
-        print(f"  Status: {droplet.get('status')}")
-        
-        # Wait for droplet to become active
-        if config["wait_for_active"]:
-            print("\nWaiting for droplet to become active...")
-            droplet = api.wait_for_droplet(droplet_id)
-            print(f"✓ Droplet is now active!")
+    with DigitalOceanAPI(api_token) as api:
+        try:
+            # Verify snapshot exists
+            print(f"Verifying snapshot: {config['snapshot_id']}")
+            snapshot = api.get_snapshot(config["snapshot_id"])
+            print(f"Snapshot found: {snapshot.get('name', 'N/A')} ({snapshot.get('id', 'N/A')})")
             
-            # Display network information
-            networks = droplet.get("networks", {})
-            v4_addresses = networks.get("v4", [])
+            # List available GPU sizes (optional, for reference)
+            print("\nFetching available GPU sizes...")
+            gpu_sizes = api.get_gpu_sizes()
+            if gpu_sizes:
+                print("Available GPU sizes:")
+                for size in gpu_sizes[:5]:  # Show first 5
+                    print(f"  - {size.get('slug')}: {size.get('description')}")
+            else:
+                print("Warning: No GPU sizes found. Make sure you're using a GPU-enabled size slug.")
             
-            if v4_addresses:
-                print("\nNetwork Information:")
-                for addr in v4_addresses:
-                    addr_type = addr.get("type", "unknown")
-                    ip = addr.get("ip_address", "N/A")
-                    print(f"  {addr_type.upper()}: {ip}")
-        
-        # Output JSON for programmatic use
-        print("\n" + "="*50)
-        print("Droplet Information (JSON):")
-        print(json.dumps(droplet, indent=2))
-        
-    except Exception as e:
-        print(f"\n✗ Error: {e}", file=sys.stderr)
-        sys.exit(1)
+            # Create droplet
+            print(f"\nCreating droplet '{config['droplet_name']}'...")
+            print(f"  Region: {config['region']}")
+            print(f"  Size: {config['size']}")
+            print(f"  Snapshot: {config['snapshot_id']}")
+            
+            droplet = api.create_droplet(
+                name=config["droplet_name"],
+                region=config["region"],
+                size=config["size"],
+                snapshot_id=config["snapshot_id"],
+                ssh_keys=config["ssh_keys"],
+                tags=config["tags"],
+                monitoring=config["monitoring"],
+                ipv6=config["ipv6"],
+                private_networking=config["private_networking"]
+            )
+            
+            droplet_id = droplet.get("id")
+            print(f"\n✓ Droplet created successfully!")
+            print(f"  Droplet ID: {droplet_id}")
+            print(f"  Name: {droplet.get('name')}")
+            print(f"  Status: {droplet.get('status')}")
+            
+            # Wait for droplet to become active
+            if config["wait_for_active"]:
+                print("\nWaiting for droplet to become active...")
+                droplet = api.wait_for_droplet(
+                    droplet_id,
+                    initial_delay=config["poll_initial_delay"],
+                    max_delay=config["poll_max_delay"]
+                )
+                print(f"✓ Droplet is now active!")
+                
+                # Display network information
+                networks = droplet.get("networks", {})
+                v4_addresses = networks.get("v4", [])
+                
+                if v4_addresses:
+                    print("\nNetwork Information:")
+                    for addr in v4_addresses:
+                        addr_type = addr.get("type", "unknown")
+                        ip = addr.get("ip_address", "N/A")
+                        print(f"  {addr_type.upper()}: {ip}")
+            
+            # Output JSON for programmatic use
+            print("\n" + "="*50)
+            print("Droplet Information (JSON):")
+            print(orjson.dumps(droplet, option=orjson.OPT_INDENT_2).decode())
+            
+        except Exception as e:
+            print(f"\n✗ Error: {e}", file=sys.stderr)
+            sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -7,10 +7,12 @@ using API token authentication.
 """
 
 import os
+import contextlib
 import sys
-import json
 import asyncio
-from typing import Any, Optional
+import functools
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
 try:
     from mcp.server import Server
     from mcp.server.stdio import stdio_server
@@ -24,13 +26,80 @@ except ImportError:
     except ImportError:
         print("Error: MCP package not found. Install with: pip install mcp", file=sys.stderr)
         sys.exit(1)
-import requests
+import httpx
+import orjson
+try:
+    import uvloop
+except ImportError:
+    # uvloop is optional (and unavailable on Windows); fall back to the stock loop
+    uvloop = None
+
+
+_ALLOWED_METHODS = frozenset({"GET", "POST", "PUT", "DELETE"})
+
+# Statuses worth retrying: rate limiting and transient server/gateway errors
+_TRANSIENT_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Cap concurrent outbound API calls so bursts of tool calls stay under the
+# per-token rate limit instead of cascading into 429 retries
+_api_sem = asyncio.Semaphore(10)
+_MAX_RETRIES = 3
+_RETRY_BACKOFF = 0.5
+_MAX_RETRY_AFTER = 60.0
+
+
+class APIError(Exception):
+    """Raised when the DigitalOcean API returns an error response."""
+
+
+def _retry_after(response: httpx.Response, attempt: int) -> float:
+    """Seconds to wait before retrying a transient response (Retry-After or exponential backoff)."""
+    delay = _RETRY_BACKOFF * 2 ** attempt
+    if "Retry-After" in response.headers:
+        try:
+            delay = float(response.headers["Retry-After"])
+        except ValueError:
+            # HTTP-date form or garbage; keep the backoff delay
+            pass
+    return min(max(delay, 0.0), _MAX_RETRY_AFTER)
+
+
+def ttl_cache(ttl_seconds: float, tag: Optional[str] = None):
+    """
+    Cache the result of an async DigitalOceanAPI method for ttl_seconds.
+    
+    Entries live on the instance and are keyed by (tag, method, args, kwargs).
+    Concurrent misses for the same key share one in-flight call, and expired
+    entries are evicted whenever a new result is stored. Methods sharing a
+    tag can be dropped together with DigitalOceanAPI._invalidate(tag); the
+    tag defaults to the method name.
+    """
+    def decorator(func):
+        cache_tag = tag or func.__name__
+        
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            key = (cache_tag, func.__name__, args, frozenset(kwargs.items()))
+            now = time.monotonic()
+            entry = self._cache.get(key)
+            if entry is not None and entry[0] > now:
+                return entry[1]
+            task = self._inflight.get(key)
+            if task is None:
+                task = asyncio.ensure_future(func(self, *args, **kwargs))
+                self._inflight[key] = task
+                task.add_done_callback(functools.partial(self._store, key, now + ttl_seconds))
+            # Shield so one cancelled caller does not cancel the call for the others
+            return await asyncio.shield(task)
+        return wrapper
+    return decorator
 
 
 class DigitalOceanAPI:
-    """Wrapper class for DigitalOcean API v2 operations."""
+    """Async wrapper class for DigitalOcean API v2 operations."""
     
     BASE_URL = "https://api.digitalocean.com/v2"
+    PER_PAGE = 200  # API maximum
     
     def __init__(self, api_token: str):
         """
@@ -44,8 +113,35 @@ class DigitalOceanAPI:
             "Authorization": f"Bearer {api_token}",
             "Content-Type": "application/json"
         }
+        
+        # Shared HTTP/2 connection pool so concurrent tool calls overlap
+        # their I/O instead of serializing on the event loop
+        self.client = httpx.AsyncClient(
+            base_url=self.BASE_URL,
+            headers=self.headers,
+            http2=True,
+            timeout=httpx.Timeout(30.0, connect=5.0),
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=20)
+        )
+        
+        # ttl_cache entries: (tag, method, args, kwargs) -> (expiry, value)
+        self._cache: dict = {}
+        # ttl_cache calls in progress: (tag, method, args, kwargs) -> task
+        self._inflight: dict = {}
+        # Conditional GET validators: endpoint -> (etag, last_modified, parsed body)
+        self._validators: dict = {}
+    
+    async def aclose(self) -> None:
+        """Close the underlying HTTP client and its pooled connections."""
+        await self.client.aclose()
     
-    def _make_request(self, method: str, endpoint: str, data: Optional[dict] = None) -> dict:
+    async def _make_request(
+        self,
+        method: str,
+        endpoint: str,
+        data: Optional[dict] = None,
+        conditional: bool = False
+    ) -> dict:
         """
         Make an API request to DigitalOcean.
         
@@ -53,83 +149,157 @@ class DigitalOceanAPI:
             method: HTTP method (GET, POST, DELETE, etc.)
             endpoint: API endpoint (without base URL)
             data: Optional JSON data for POST/PUT requests
+            conditional: For GETs, revalidate a previous response with
+                If-None-Match/If-Modified-Since and reuse it on 304
             
         Returns:
             JSON response as dictionary
             
         Raises:
-            Exception: If API request fails
+            APIError: If the API returns an error response
+            httpx.HTTPError: If the request cannot be completed
         """
-        url = f"{self.BASE_URL}{endpoint}"
+        method = method.upper()
+        if method not in _ALLOWED_METHODS:
+            raise ValueError(f"Unsupported HTTP method: {method}")
+        
+        conditional = conditional and method == "GET"
+        cached = self._validators.get(endpoint) if conditional else None
+        headers = None
+        if cached is not None:
+            etag, last_modified, _ = cached
+            headers = {}
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
         
         try:
-            if method.upper() == "GET":
-                response = requests.get(url, headers=self.headers)
-            elif method.upper() == "POST":
-                response = requests.post(url, headers=self.headers, json=data)
-            elif method.upper() == "DELETE":
-                response = requests.delete(url, headers=self.headers)
-            elif method.upper() == "PUT":
-                response = requests.put(url, headers=self.headers, json=data)
-            else:
-                raise ValueError(f"Unsupported HTTP method: {method}")
-            
+            for attempt in range(_MAX_RETRIES + 1):
+                async with _api_sem:
+                    response = await self.client.request(method, endpoint, json=data, headers=headers)
+                status = response.status_code
+                if status not in _TRANSIENT_STATUSES or attempt == _MAX_RETRIES:
+                    break
+                # A 5xx on POST may still have created the resource; only 429 is safe to resend
+                if method == "POST" and status != 429:
+                    break
+                await asyncio.sleep(_retry_after(response, attempt))
+            if cached is not None and response.status_code == 304:
+                return cached[2]
             response.raise_for_status()
-            return response.json()
-        except requests.exceptions.HTTPError as e:
-            error_msg = f"API Error: {e}"
-            if hasattr(e.response, 'text'):
-                try:
-                    error_data = e.response.json()
-                    if 'message' in error_data:
-                        error_msg = f"API Error: {error_data['message']}"
-                except:
-                    error_msg = f"API Error: {e.response.text}"
-            raise Exception(error_msg) from e
+            # Parse the raw bytes directly; empty bodies (e.g. 204 on DELETE) yield {}
+            result = orjson.loads(response.content) if response.content else {}
+            if conditional:
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+                if etag or last_modified:
+                    self._validators[endpoint] = (etag, last_modified, result)
+            return result
+        except httpx.HTTPStatusError as e:
+            # Reuse the body that was already read; only a malformed JSON body is ignored
+            body = e.response.content
+            message = None
+            with contextlib.suppress(orjson.JSONDecodeError):
+                error_data = orjson.loads(body)
+                if isinstance(error_data, dict):
+                    message = error_data.get("message")
+            raise APIError(f"API Error: {message or body.decode(errors='replace') or e}") from e
+    
+    def _store(self, key: tuple, expiry: float, task: asyncio.Future) -> None:
+        """Record a finished ttl_cache call and evict expired entries."""
+        # A call detached by _invalidate finished after the data changed; drop it
+        if self._inflight.get(key) is not task:
+            return
+        del self._inflight[key]
+        if task.cancelled() or task.exception() is not None:
+            return
+        now = time.monotonic()
+        for stale in [stale for stale, (stale_expiry, _) in self._cache.items() if stale_expiry <= now]:
+            del self._cache[stale]
+        self._cache[key] = (expiry, task.result())
     
-    def get_regions(self) -> list:
+    def _invalidate(self, tag: str) -> None:
+        """Drop all cached entries and in-flight calls recorded under the given ttl_cache tag."""
+        for key in [key for key in self._cache if key[0] == tag]:
+            del self._cache[key]
+        for key in [key for key in self._inflight if key[0] == tag]:
+            del self._inflight[key]
+    
+    async def _paginate(
+        self,
+        endpoint: str,
+        key: str,
+        per_page: Optional[int] = None,
+        conditional: bool = False
+    ) -> AsyncIterator[dict]:
+        """
+        Yield items from a paginated list endpoint, one page at a time.
+        
+        Follows links.pages.next, so only the current page is held in memory
+        and callers can filter items as they arrive.
+        
+        Args:
+            endpoint: API endpoint (without base URL)
+            key: Response key holding the list of items
+            per_page: Page size (defaults to PER_PAGE, the API maximum)
+            conditional: Revalidate each page with a conditional GET
+            
+        Yields:
+            Items from each page in order
+        """
+        separator = "&" if "?" in endpoint else "?"
+        next_endpoint = f"{endpoint}{separator}per_page={per_page or self.PER_PAGE}"
+        while next_endpoint:
+            response = await self._make_request("GET", next_endpoint, conditional=conditional)
+            for item in response.get(key, []):
+                yield item
+            next_url = response.get("links", {}).get("pages", {}).get("next")
+            next_endpoint = next_url.replace(self.BASE_URL, "", 1) if next_url else None
+    
+    @ttl_cache(86400)
+    async def get_regions(self) -> list:
         """Get list of available regions."""
-        response = self._make_request("GET", "/regions")
-        return response.get("regions", [])
+        return [region async for region in self._paginate("/regions", "regions", conditional=True)]
     
-    def get_sizes(self) -> list:
+    @ttl_cache(3600)
+    async def get_sizes(self) -> list:
         """Get list of available droplet sizes."""
-        response = self._make_request("GET", "/sizes")
-        return response.get("sizes", [])
+        return [size async for size in self._paginate("/sizes", "sizes", conditional=True)]
     
-    def get_gpu_sizes(self) -> list:
+    async def get_gpu_sizes(self) -> list:
         """Get list of available GPU droplet sizes."""
-        sizes = self.get_sizes()
-        gpu_sizes = [size for size in sizes if size.get("description", "").lower().find("gpu") != -1]
-        return gpu_sizes
+        sizes = await self.get_sizes()
+        # gpu_info is the structured marker; the description check only runs
+        # for sizes that lack it
+        return [size for size in sizes if size.get("gpu_info") or "gpu" in size.get("description", "").lower()]
     
-    def get_images(self) -> list:
+    async def get_images(self) -> list:
         """Get list of available images."""
-        response = self._make_request("GET", "/images")
-        return response.get("images", [])
+        return [image async for image in self._paginate("/images", "images")]
     
-    def get_snapshots(self) -> list:
+    async def get_snapshots(self) -> list:
         """Get list of available snapshots."""
-        images = self.get_images()
-        snapshots = [img for img in images if img.get("type") == "snapshot"]
-        return snapshots
+        return [snapshot async for snapshot in self._paginate("/snapshots?resource_type=droplet", "snapshots")]
     
-    def get_snapshot(self, snapshot_id: str) -> dict:
+    @ttl_cache(300)
+    async def get_snapshot(self, snapshot_id: str) -> dict:
         """Get snapshot information by ID."""
-        response = self._make_request("GET", f"/snapshots/{snapshot_id}")
+        response = await self._make_request("GET", f"/snapshots/{snapshot_id}")
         return response.get("snapshot", {})
     
-    def get_droplets(self) -> list:
+    @ttl_cache(10, tag="droplets")
+    async def get_droplets(self) -> list:
         """Get list of all droplets."""
-        response = self._make_request("GET", "/droplets")
-        return response.get("droplets", [])
+        return [droplet async for droplet in self._paginate("/droplets", "droplets")]
     
-    def get_droplet(self, droplet_id: int) -> dict:
+    @ttl_cache(10, tag="droplets")
+    async def get_droplet(self, droplet_id: int) -> dict:
         """Get droplet information by ID."""
-        response = self._make_request("GET", f"/droplets/{droplet_id}")
+        response = await self._make_request("GET", f"/droplets/{droplet_id}")
         return response.get("droplet", {})
     
-    def create_droplet(
+    async def create_droplet(
         self,
         name: str,
         region: str,
@@ -160,22 +330,24 @@ class DigitalOceanAPI:
         if user_data:
             droplet_data["user_data"] = user_data
         
-        response = self._make_request("POST", "/droplets", data=droplet_data)
+        response = await self._make_request("POST", "/droplets", data=droplet_data)
+        self._invalidate("droplets")
         return response.get("droplet", {})
     
-    def delete_droplet(self, droplet_id: int) -> dict:
+    async def delete_droplet(self, droplet_id: int) -> dict:
         """Delete a droplet."""
-        response = self._make_request("DELETE", f"/droplets/{droplet_id}")
+        response = await self._make_request("DELETE", f"/droplets/{droplet_id}")
+        self._invalidate("droplets")
         return response
     
-    def get_ssh_keys(self) -> list:
+    @ttl_cache(600)
+    async def get_ssh_keys(self) -> list:
         """Get list of SSH keys."""
-        response = self._make_request("GET", "/account/keys")
-        return response.get("ssh_keys", [])
+        return [key async for key in self._paginate("/account/keys", "ssh_keys")]
     
-    def get_account_info(self) -> dict:
+    async def get_account_info(self) -> dict:
         """Get account information."""
-        response = self._make_request("GET", "/account")
+        response = await self._make_request("GET", "/account")
         return response.get("account", {})
 
 
@@ -184,257 +356,259 @@ server = Server("digitalocean-mcp")
 
 # Global API client (will be initialized with token from environment)
 api_client: Optional[DigitalOceanAPI] = None
+_api_lock = asyncio.Lock()
 
 
-def get_api_client() -> DigitalOceanAPI:
-    """Get or initialize the DigitalOcean API client."""
+async def get_api_client() -> DigitalOceanAPI:
+    """
+    Get or initialize the shared DigitalOcean API client.
+    
+    The client is created lazily inside the running event loop, under a lock
+    so concurrent tool calls share one client and connection pool.
+    """
     global api_client
     if api_client is None:
-        api_token = os.getenv("DIGITALOCEAN_API_TOKEN")
-        if not api_token:
-            raise ValueError("DIGITALOCEAN_API_TOKEN environment variable is not set")
-        api_client = DigitalOceanAPI(api_token)
+        async with _api_lock:
+            if api_client is None:
+                api_token = os.getenv("DIGITALOCEAN_API_TOKEN")
+                if not api_token:
+                    raise ValueError("DIGITALOCEAN_API_TOKEN environment variable is not set")
+                api_client = DigitalOceanAPI(api_token)
     return api_client
 
 
-@server.list_tools()
-async def list_tools() -> list[Tool]:
-    """List available tools."""
-    return [
-        Tool(
-            name="do_list_regions",
-            description="List all available DigitalOcean regions",
-            inputSchema={
-                "type": "object",
-                "properties": {},
-            }
-        ),
-        Tool(
-            name="do_list_sizes",
-            description="List all available droplet sizes (including GPU sizes)",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "gpu_only": {
-                        "type": "boolean",
-                        "description": "If true, only return GPU-enabled sizes",
-                        "default": False
-                    }
+# Tool definitions are static, so build them once at import time
+_TOOLS: list[Tool] = [
+    Tool(
+        name="do_list_regions",
+        description="List all available DigitalOcean regions",
+        inputSchema={
+            "type": "object",
+            "properties": {},
+        }
+    ),
+    Tool(
+        name="do_list_sizes",
+        description="List all available droplet sizes (including GPU sizes)",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "gpu_only": {
+                    "type": "boolean",
+                    "description": "If true, only return GPU-enabled sizes",
+                    "default": False
                 }
             }
-        ),
-        Tool(
-            name="do_list_snapshots",
-            description="List all available snapshots",
-            inputSchema={
-                "type": "object",
-                "properties": {},
-            }
-        ),
-        Tool(
-            name="do_get_snapshot",
-            description="Get information about a specific snapshot by ID",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "snapshot_id": {
-                        "type": "string",
-                        "description": "Snapshot ID or slug"
-                    }
+        }
+    ),
+    Tool(
+        name="do_list_snapshots",
+        description="List all available snapshots",
+        inputSchema={
+            "type": "object",
+            "properties": {},
+        }
+    ),
+    Tool(
+        name="do_get_snapshot",
+        description="Get information about a specific snapshot by ID",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "snapshot_id": {
+                    "type": "string",
+                    "description": "Snapshot ID or slug"
+                }
+            },
+            "required": ["snapshot_id"]
+        }
+    ),
+    Tool(
+        name="do_list_droplets",
+        description="List all droplets in your account",
+        inputSchema={
+            "type": "object",
+            "properties": {},
+        }
+    ),
+    Tool(
+        name="do_get_droplet",
+        description="Get information about a specific droplet by ID",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "droplet_id": {
+                    "type": "integer",
+                    "description": "Droplet ID"
+                }
+            },
+            "required": ["droplet_id"]
+        }
+    ),
+    Tool(
+        name="do_create_droplet",
+        description="Create a new droplet",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "name": {
+                    "type": "string",
+                    "description": "Droplet name"
                 },
-                "required": ["snapshot_id"]
-            }
-        ),
-        Tool(
-            name="do_list_droplets",
-            description="List all droplets in your account",
-            inputSchema={
-                "type": "object",
-                "properties": {},
-            }
-        ),
-        Tool(
-            name="do_get_droplet",
-            description="Get information about a specific droplet by ID",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "droplet_id": {
-                        "type": "integer",
-                        "description": "Droplet ID"
-                    }
+                "region": {
+                    "type": "string",
+                    "description": "Region slug (e.g., 'nyc1', 'sfo3')"
                 },
-                "required": ["droplet_id"]
-            }
-        ),
-        Tool(
-            name="do_create_droplet",
-            description="Create a new droplet",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "name": {
-                        "type": "string",
-                        "description": "Droplet name"
-                    },
-                    "region": {
-                        "type": "string",
-                        "description": "Region slug (e.g., 'nyc1', 'sfo3')"
-                    },
-                    "size": {
-                        "type": "string",
-                        "description": "Droplet size slug (e.g., 's-1vcpu-1gb', 'g-2vcpu-16gb')"
-                    },
-                    "image": {
-                        "type": "string",
-                        "description": "Image ID, snapshot ID, or image slug"
-                    },
-                    "ssh_keys": {
-                        "type": "array",
-                        "items": {"type": "string"},
-                        "description": "Optional list of SSH key IDs or fingerprints"
-                    },
-                    "tags": {
-                        "type": "array",
-                        "items": {"type": "string"},
-                        "description": "Optional list of tags"
-                    },
-                    "user_data": {
-                        "type": "string",
-                        "description": "Optional cloud-init user data"
-                    },
-                    "monitoring": {
-                        "type": "boolean",
-                        "description": "Enable monitoring",
-                        "default": False
-                    },
-                    "ipv6": {
-                        "type": "boolean",
-                        "description": "Enable IPv6",
-                        "default": False
-                    },
-                    "private_networking": {
-                        "type": "boolean",
-                        "description": "Enable private networking",
-                        "default": True
-                    }
+                "size": {
+                    "type": "string",
+                    "description": "Droplet size slug (e.g., 's-1vcpu-1gb', 'g-2vcpu-16gb')"
                 },
-                "required": ["name", "region", "size", "image"]
-            }
-        ),
-        Tool(
-            name="do_delete_droplet",
-            description="Delete a droplet by ID",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "droplet_id": {
-                        "type": "integer",
-                        "description": "Droplet ID to delete"
-                    }
+                "image": {
+                    "type": "string",
+                    "description": "Image ID, snapshot ID, or image slug"
                 },
-                "required": ["droplet_id"]
-            }
-        ),
-        Tool(
-            name="do_list_ssh_keys",
-            description="List all SSH keys in your account",
-            inputSchema={
-                "type": "object",
-                "properties": {},
-            }
-        ),
-        Tool(
-            name="do_get_account_info",
-            description="Get account information",
-            inputSchema={
-                "type": "object",
-                "properties": {},
-            }
-        ),
-    ]
+                "ssh_keys": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "Optional list of SSH key IDs or fingerprints"
+                },
+                "tags": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "Optional list of tags"
+                },
+                "user_data": {
+                    "type": "string",
+                    "description": "Optional cloud-init user data"
+                },
+                "monitoring": {
+                    "type": "boolean",
+                    "description": "Enable monitoring",
+                    "default": False
+                },
+                "ipv6": {
+                    "type": "boolean",
+                    "description": "Enable IPv6",
+                    "default": False
+                },
+                "private_networking": {
+                    "type": "boolean",
+                    "description": "Enable private networking",
+                    "default": True
+                }
+            },
+            "required": ["name", "region", "size", "image"]
+        }
+    ),
+    Tool(
+        name="do_delete_droplet",
+        description="Delete a droplet by ID",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "droplet_id": {
+                    "type": "integer",
+                    "description": "Droplet ID to delete"
+                }
+            },
+            "required": ["droplet_id"]
+        }
+    ),
+    Tool(
+        name="do_list_ssh_keys",
+        description="List all SSH keys in your account",
+        inputSchema={
+            "type": "object",
+            "properties": {},
+        }
+    ),
+    Tool(
+        name="do_get_account_info",
+        description="Get account information",
+        inputSchema={
+            "type": "object",
+            "properties": {},
+        }
+    ),
+]
+
+
+@server.list_tools()
+async def list_tools() -> list[Tool]:
+    """List available tools."""
+    return _TOOLS
+
+
+async def _list_sizes(api: DigitalOceanAPI, arguments: dict) -> list:
+    """Handle do_list_sizes, honouring the gpu_only flag."""
+    if arguments.get("gpu_only", False):
+        return await api.get_gpu_sizes()
+    return await api.get_sizes()
+
+
+async def _create_droplet(api: DigitalOceanAPI, arguments: dict) -> dict:
+    """Handle do_create_droplet."""
+    return await api.create_droplet(
+        name=arguments["name"],
+        region=arguments["region"],
+        size=arguments["size"],
+        image=arguments["image"],
+        ssh_keys=arguments.get("ssh_keys"),
+        tags=arguments.get("tags"),
+        user_data=arguments.get("user_data"),
+        monitoring=arguments.get("monitoring", False),
+        ipv6=arguments.get("ipv6", False),
+        private_networking=arguments.get("private_networking", True)
+    )
+
+
+# Tool name -> handler returning the JSON-serializable result
+_DISPATCH: dict[str, Callable[[DigitalOceanAPI, dict], Awaitable[Any]]] = {
+    "do_list_regions": lambda api, arguments: api.get_regions(),
+    "do_list_sizes": _list_sizes,
+    "do_list_snapshots": lambda api, arguments: api.get_snapshots(),
+    "do_get_snapshot": lambda api, arguments: api.get_snapshot(arguments.get("snapshot_id")),
+    "do_list_droplets": lambda api, arguments: api.get_droplets(),
+    "do_get_droplet": lambda api, arguments: api.get_droplet(arguments.get("droplet_id")),
+    "do_create_droplet": _create_droplet,
+    "do_delete_droplet": lambda api, arguments: api.delete_droplet(arguments.get("droplet_id")),
+    "do_list_ssh_keys": lambda api, arguments: api.get_ssh_keys(),
+    "do_get_account_info": lambda api, arguments: api.get_account_info(),
+}
 
 
 @server.call_tool()
 async def call_tool(name: str, arguments: dict) -> list[TextContent]:
     """Handle tool calls."""
     try:
-        api = get_api_client()
+        api = await get_api_client()
     except ValueError as e:
         return [TextContent(type="text", text=f"Error: {str(e)}")]
     
-    try:
-        if name == "do_list_regions":
-            regions = api.get_regions()
-            return [TextContent(type="text", text=json.dumps(regions, indent=2))]
-        
-        elif name == "do_list_sizes":
-            gpu_only = arguments.get("gpu_only", False)
-            if gpu_only:
-                sizes = api.get_gpu_sizes()
-            else:
-                sizes = api.get_sizes()
-            return [TextContent(type="text", text=json.dumps(sizes, indent=2))]
-        
-        elif name == "do_list_snapshots":
-            snapshots = api.get_snapshots()
-            return [TextContent(type="text", text=json.dumps(snapshots, indent=2))]
-        
-        elif name == "do_get_snapshot":
-            snapshot_id = arguments.get("snapshot_id")
-            snapshot = api.get_snapshot(snapshot_id)
-            return [TextContent(type="text", text=json.dumps(snapshot, indent=2))]
-        
-        elif name == "do_list_droplets":
-            droplets = api.get_droplets()
-            return [TextContent(type="text", text=json.dumps(droplets, indent=2))]
-        
-        elif name == "do_get_droplet":
-            droplet_id = arguments.get("droplet_id")
-            droplet = api.get_droplet(droplet_id)
-            return [TextContent(type="text", text=json.dumps(droplet, indent=2))]
-        
-        elif name == "do_create_droplet":
-            droplet = api.create_droplet(
-                name=arguments["name"],
-                region=arguments["region"],
-                size=arguments["size"],
-                image=arguments["image"],
-                ssh_keys=arguments.get("ssh_keys"),
-                tags=arguments.get("tags"),
-                user_data=arguments.get("user_data"),
-                monitoring=arguments.get("monitoring", False),
-                ipv6=arguments.get("ipv6", False),
-                private_networking=arguments.get("private_networking", True)
-            )
-            return [TextContent(type="text", text=json.dumps(droplet, indent=2))]
-        
-        elif name == "do_delete_droplet":
-            droplet_id = arguments.get("droplet_id")
-            result = api.delete_droplet(droplet_id)
-            return [TextContent(type="text", text=json.dumps(result, indent=2))]
-        
-        elif name == "do_list_ssh_keys":
-            ssh_keys = api.get_ssh_keys()
-            return [TextContent(type="text", text=json.dumps(ssh_keys, indent=2))]
-        
-        elif name == "do_get_account_info":
-            account = api.get_account_info()
-            return [TextContent(type="text", text=json.dumps(account, indent=2))]
-        
-        else:
-            return [TextContent(type="text", text=f"Unknown tool: {name}")]
+    handler = _DISPATCH.get(name)
+    if handler is None:
+        return [TextContent(type="text", text=f"Unknown tool: {name}")]
     
+    try:
+        result = await handler(api, arguments)
+        return [TextContent(type="text", text=orjson.dumps(result, option=orjson.OPT_INDENT_2).decode())]
     except Exception as e:
         return [TextContent(type="text", text=f"Error: {str(e)}")]
 
 
 async def main():
     """Main entry point for the MCP server."""
-    async with stdio_server() as (read_stream, write_stream):
-        await server.run(read_stream, write_stream, server.create_initialization_options())
+    try:
+        async with stdio_server() as (read_stream, write_stream):
+            await server.run(read_stream, write_stream, server.create_initialization_options())
+    finally:
+        if api_client is not None:
+            await api_client.aclose()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    if uvloop is not None:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())
 